@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+MTIME-INVALIDATED DIRECTORY INDEXES
+-----------------------------------
+The sessions, queue and errors directories are tiny JSON-file stores that
+several endpoints consult on every UI poll. Each index keeps one parsed
+{name: payload} dict in memory and rescans only when the directory mtime
+changes, so an unchanged poll costs a single stat instead of a scan plus
+a file open per entry.
+
+Writers publish via tmp-file + rename (see atomic_write in the server),
+which always bumps the directory mtime - content-only edits in place
+would not, so keep using the atomic publish pattern.
+"""
+
+import os
+import orjson
+
+
+class JsonDirIndex:
+    """
+    Parsed view of a directory of small JSON files, keyed by filename
+    minus the .json suffix. Half-written or corrupt files are skipped;
+    the next directory change retries them.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._mtime = -1
+        self._entries = {}
+
+    def get(self):
+        try:
+            mtime = os.stat(self.root).st_mtime_ns
+        except OSError:
+            self._mtime, self._entries = -1, {}
+            return self._entries
+
+        if mtime == self._mtime:
+            return self._entries
+
+        entries = {}
+        with os.scandir(self.root) as it:
+            for e in it:
+                if not e.name.endswith(".json"):
+                    continue
+                try:
+                    with open(e.path, "rb") as f:
+                        entries[e.name[:-5]] = orjson.loads(f.read())
+                except Exception:
+                    continue
+
+        self._mtime = mtime
+        self._entries = entries
+        return entries
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+SQLITE JOB QUEUE (WAL MODE)
+---------------------------
+Shared by the admin server (enqueue) and the pipeline worker (claim).
+Replaces the per-file JSON queue: a claim is one atomic UPDATE instead
+of listdir + sort + open + parse + rename, and WAL lets the server
+insert while the worker claims without either blocking the other.
+
+Connections are cheap to open against a WAL database, so callers that
+run on many threads (the FastAPI threadpool) just open one per
+operation rather than sharing a connection across threads.
+"""
+
+import json
+import time
+import sqlite3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    payload    TEXT NOT NULL,
+    status     TEXT NOT NULL DEFAULT 'pending',
+    claimed_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, id);
+"""
+
+
+def connect(path):
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def enqueue(conn, payload):
+    conn.execute("INSERT INTO jobs (payload) VALUES (?)",
+                 (json.dumps(payload),))
+
+
+def claim(conn):
+    """Atomically claim the oldest pending job. Returns (id, payload) or None."""
+    row = conn.execute(
+        "UPDATE jobs SET status='processing', claimed_at=? "
+        "WHERE id=(SELECT id FROM jobs WHERE status='pending' ORDER BY id LIMIT 1) "
+        "RETURNING id, payload", (time.time(),)).fetchone()
+    return (row[0], json.loads(row[1])) if row else None
+
+
+def claim_ids(conn, ids):
+    """Claim a specific set of pending jobs (for batching). Returns claimed ids."""
+    if not ids:
+        return []
+    marks = ",".join("?" * len(ids))
+    rows = conn.execute(
+        f"UPDATE jobs SET status='processing', claimed_at=? "
+        f"WHERE status='pending' AND id IN ({marks}) RETURNING id",
+        (time.time(), *ids)).fetchall()
+    return [r[0] for r in rows]
+
+
+def finish(conn, ids):
+    if not ids:
+        return
+    marks = ",".join("?" * len(ids))
+    conn.execute(f"DELETE FROM jobs WHERE id IN ({marks})", tuple(ids))
+
+
+def pending(conn):
+    """Pending jobs oldest-first as (id, payload) pairs."""
+    rows = conn.execute(
+        "SELECT id, payload FROM jobs WHERE status='pending' ORDER BY id").fetchall()
+    return [(r[0], json.loads(r[1])) for r in rows]
+
+
+def queued_filenames(conn):
+    """Filenames of every job not yet finished (pending or processing)."""
+    rows = conn.execute("SELECT payload FROM jobs").fetchall()
+    return {json.loads(r[0]).get('filename') for r in rows}
+
+
+def requeue_stale(conn, max_age=6 * 3600):
+    """Return jobs a crashed worker claimed but never finished."""
+    conn.execute(
+        "UPDATE jobs SET status='pending', claimed_at=NULL "
+        "WHERE status='processing' AND claimed_at < ?", (time.time() - max_age,))
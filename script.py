@@ -7,7 +7,9 @@ AD10 SRT MASTER (ULTIMATE EDITION - DUAL PIPE)
 - Features: RTX 4060 OCR + Crowd Noise + Motion + Reels
 """
 
-import sys, time, subprocess, shlex, threading, os
+import sys, time, subprocess, shlex, threading, os, queue, selectors, functools
+import multiprocessing as mp
+from multiprocessing import shared_memory
 from collections import deque
 from pathlib import Path
 import cv2
@@ -21,6 +23,35 @@ except ImportError:
     OCR_AVAILABLE = False
     print("⚠️ EasyOCR not found. OCR features disabled.")
 
+# Try importing RapidOCR (optional - preferred backend when present)
+try:
+    from rapidocr_onnxruntime import RapidOCR
+    RAPIDOCR_AVAILABLE = True
+except ImportError:
+    RAPIDOCR_AVAILABLE = False
+
+# Try importing pyahocorasick (optional single-pass keyword matching)
+try:
+    import ahocorasick
+    AHO_AVAILABLE = True
+except ImportError:
+    AHO_AVAILABLE = False
+
+# Try importing numpy-rms (optional SIMD kernel for the audio monitor)
+try:
+    import numpy_rms
+    NUMPY_RMS_AVAILABLE = True
+except ImportError:
+    NUMPY_RMS_AVAILABLE = False
+
+# Try importing TensorRT stack (optional - falls back to stock EasyOCR)
+try:
+    import torch
+    import tensorrt as trt
+    TRT_AVAILABLE = True
+except ImportError:
+    TRT_AVAILABLE = False
+
 # =============== CONFIG ==================
 
 WIDTH   = 1920
@@ -30,8 +61,11 @@ FPS     = 25
 # --- TRIGGER SETTINGS ---
 
 # 1. OCR (Visual Text)
-OCR_INTERVAL = 0.4  # Check every 0.4s
+OCR_INTERVAL = 0.15  # Check every 0.15s (batched dispatch keeps GPU load flat)
 OCR_KEYWORDS = ["4", "6", "OUT", "WICKET", "APPEAL", "REVIEW", "BOWLED", "CAUGHT", "CENTURY"]
+OCR_BATCH = 8        # ROIs per readtext_batched call
+OCR_FLUSH_IDLE = 0.5 # Flush a partial batch after this much stream time
+OCR_ROI_MIN_DIFF = 0.5 # Mean ROI diff below this = scoreboard unchanged, skip OCR
 
 # 2. AUDIO (Crowd Noise)
 # ENABLED via Dual-Pipe (No extra connection required)
@@ -41,6 +75,10 @@ AUDIO_SUSTAIN = 3
 
 # 3. MOTION (Action)
 SCENE_THRESH = 12.0
+# Motion is low-frequency: score a 96x54 block-reduced grid (~5KB) instead
+# of full 1080p. INTER_AREA is a SIMD box-filter, so each cell is already
+# the block average and the score stays calibrated to SCENE_THRESH.
+MOTION_W, MOTION_H = 96, 54
 
 # --- CLIP TIMING ---
 RUNUP_SEC = 6.0 
@@ -51,6 +89,10 @@ BALL_MAX  = 25.0
 BUFFER_SEC = RUNUP_SEC + POST_SEC + BALL_MAX
 BUFFER_LEN = int(FPS * BUFFER_SEC)
 
+# Recording is segmented so cuts are a constant-time concat of N small
+# files instead of a linear seek through one ever-growing .ts
+SEGMENT_SEC = 2
+
 # Default Vendor URL
 VENDOR_SRT = "203.130.9.34:7001" 
 
@@ -72,13 +114,14 @@ else:
 current_match_dir = MATCHES_ROOT / match_name
 balls_dir = current_match_dir / "Full Screen"
 final_dir = current_match_dir / "Reel"
-record_ts = current_match_dir / "full_match.ts"
+segments_dir = current_match_dir / "segments"
 
 print(f"\n[CONFIG] Match: {match_name}")
 print(f"[CONFIG] Source: {target_url}")
 
 balls_dir.mkdir(parents=True, exist_ok=True)
 final_dir.mkdir(parents=True, exist_ok=True)
+segments_dir.mkdir(parents=True, exist_ok=True)
 
 # ============ HELPERS ====================
 
@@ -90,16 +133,367 @@ def cleanup_zombies():
         time.sleep(1) 
     except: pass
 
+def nvdec_available():
+    """True if the local ffmpeg build exposes the CUDA (NVDEC) hwaccel."""
+    try:
+        out = subprocess.run(
+            ["ffmpeg", "-hide_banner", "-hwaccels"],
+            capture_output=True, text=True, timeout=10
+        )
+        return "cuda" in out.stdout.split()
+    except Exception:
+        return False
+
+STREAM_PREFIXES = ("srt://", "http", "udp")
+
+@functools.lru_cache(maxsize=4)
 def build_srt_url(vendor: str) -> str:
-    if Path(vendor).exists(): 
+    # Memoized: the watchdog loop re-resolves on every reconnect, and the
+    # Path.exists probe is a syscall we only need once per vendor string
+    if Path(vendor).exists():
         return str(Path(vendor).resolve())
-    if any(vendor.startswith(s) for s in ["srt://", "http", "udp"]):
+    if vendor.startswith(STREAM_PREFIXES):
         return vendor
     # Optimized Latency for Stability
     return f"srt://{vendor}?mode=caller&transtype=live&latency=1000&peerlatency=1000"
 
+# ============ TENSORRT OCR ACCELERATION ===================
+# Scoreboard ROI is a fixed crop, so the CRAFT detector can run as a
+# pre-built FP16 TensorRT engine instead of the PyTorch forward pass.
+
+ENGINE_DIR = BASE_DIR / "trt_cache"
+
+# ROI used by run_engine (bottom strip of the frame)
+ROI_Y0 = int(HEIGHT * 0.75)
+ROI_X0 = int(WIDTH * 0.15)
+ROI_H = HEIGHT - ROI_Y0                      # 270
+ROI_W = int(WIDTH * 0.85) - ROI_X0           # 1344
+
+
+def cuda_cv_available():
+    """True if OpenCV was built with CUDA and a device is present."""
+    try:
+        return cv2.cuda.getCudaEnabledDeviceCount() > 0
+    except Exception:
+        return False
+
+
+class TRTDetector:
+    """Drop-in replacement for EasyOCR's CRAFT detector net.
+
+    Loads (or builds once) a per-GPU-arch FP16 engine and runs it via
+    execute_async_v3 on the current torch CUDA stream. Callable like the
+    original net: returns (y, feature) tensors.
+    """
+
+    def __init__(self, engine_path):
+        self.logger = trt.Logger(trt.Logger.WARNING)
+        with open(engine_path, "rb") as f:
+            self.engine = trt.Runtime(self.logger).deserialize_cuda_engine(f.read())
+        self.context = self.engine.create_execution_context()
+        self.input_name = self.engine.get_tensor_name(0)
+        self.output_names = [
+            self.engine.get_tensor_name(i)
+            for i in range(1, self.engine.num_io_tensors)
+        ]
+
+    def eval(self):
+        return self  # parity with nn.Module API
+
+    def __call__(self, x):
+        x = x.half().contiguous().cuda()
+        self.context.set_input_shape(self.input_name, tuple(x.shape))
+        self.context.set_tensor_address(self.input_name, x.data_ptr())
+
+        outputs = []
+        for name in self.output_names:
+            shape = tuple(self.context.get_tensor_shape(name))
+            out = torch.empty(shape, dtype=torch.half, device="cuda")
+            self.context.set_tensor_address(name, out.data_ptr())
+            outputs.append(out)
+
+        stream = torch.cuda.current_stream()
+        self.context.execute_async_v3(stream.cuda_stream)
+        stream.synchronize()
+        return tuple(o.float() for o in outputs)
+
+
+def build_trt_engine(reader):
+    """Export CRAFT to ONNX and compile an FP16 engine (cached per GPU arch)."""
+    major, minor = torch.cuda.get_device_capability()
+    arch = f"sm{major}{minor}"
+    ENGINE_DIR.mkdir(exist_ok=True)
+    engine_path = ENGINE_DIR / f"craft_{arch}_fp16.engine"
+    onnx_path = ENGINE_DIR / "craft.onnx"
+
+    if not engine_path.exists():
+        print(f"[OCR] Building TensorRT engine for {arch} (one-time)...")
+        dummy = torch.randn(1, 3, ROI_H + 2, ROI_W, device="cuda")
+        torch.onnx.export(
+            reader.detector, dummy, str(onnx_path),
+            input_names=["input"], output_names=["y", "feature"],
+            dynamic_axes={"input": {0: "batch", 2: "height", 3: "width"}},
+            opset_version=13,
+        )
+        cmd = (
+            f"trtexec --onnx={onnx_path} --saveEngine={engine_path} --fp16 "
+            f"--minShapes=input:1x3x64x64 "
+            f"--optShapes=input:1x3x{ROI_H + 2}x{ROI_W} "
+            f"--maxShapes=input:1x3x{HEIGHT}x{WIDTH}"
+        )
+        result = subprocess.run(shlex.split(cmd), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        if result.returncode != 0 or not engine_path.exists():
+            raise RuntimeError("trtexec failed to build engine")
+    return engine_path
+
+
+def accelerate_reader(reader):
+    """Swap the CRAFT PyTorch forward pass for the TRT engine (best effort).
+
+    The recognizer stays on PyTorch (recurrent layers don't convert well);
+    detection dominates the per-call cost on the fixed-shape ROI.
+    """
+    if not TRT_AVAILABLE:
+        return reader
+    try:
+        engine_path = build_trt_engine(reader)
+        reader.detector = TRTDetector(engine_path)
+        print("[OCR] TensorRT FP16 engine loaded.")
+    except Exception as e:
+        print(f"⚠️ TensorRT acceleration unavailable ({e}). Using stock EasyOCR.")
+    return reader
+
+# ============ OCR BACKEND SELECTION ===================
+
+class RapidOCRAdapter:
+    """Exposes RapidOCR behind EasyOCR's readtext(detail=0) call shape.
+
+    RapidOCR's CRNN recognizer avoids the recurrent-layer stalls that make
+    EasyOCR slow on GPU, and its CRAFT-free detector has no Python-side
+    postprocessing bottleneck.
+    """
+
+    def __init__(self):
+        self.ocr = RapidOCR()
+
+    def readtext(self, img, detail=0):
+        result, _ = self.ocr(img)
+        return [r[1] for r in (result or [])]
+
+
+def init_ocr_reader():
+    """Pick the fastest available OCR backend: RapidOCR > EasyOCR (+TRT)."""
+    if RAPIDOCR_AVAILABLE:
+        print("[OCR] Using RapidOCR (ONNX Runtime).")
+        return RapidOCRAdapter()
+    if OCR_AVAILABLE:
+        print("[OCR] Initializing RTX 4060...")
+        if TRT_AVAILABLE:
+            torch.backends.cudnn.benchmark = True  # autotune for the fixed ROI shape
+        reader = easyocr.Reader(['en'], gpu=True, cudnn_benchmark=True)
+        return accelerate_reader(reader)
+    return None
+
+# ============ SCOREBOARD BAND CALIBRATION ===================
+
+def calibrate_scoreboard_band(gray):
+    """Locate the high-contrast scoreboard strip inside the bottom quarter.
+
+    Scoreboard text usually sits in a narrow band, so row variance spikes
+    there. Returns absolute (y0, y1) row bounds with a small pad; falls back
+    to the full bottom strip when no clear band stands out.
+    """
+    bottom = gray[ROI_Y0:HEIGHT, ROI_X0:ROI_X0 + ROI_W]
+    row_var = bottom.astype(np.float32).var(axis=1)
+    active = np.where(row_var > max(float(row_var.mean()), 1.0))[0]
+    if active.size < 10:
+        return ROI_Y0, HEIGHT
+    y0 = ROI_Y0 + max(int(active[0]) - 8, 0)
+    y1 = ROI_Y0 + min(int(active[-1]) + 8, ROI_H)
+    if y1 - y0 < 40:  # too thin to be the scoreboard - don't over-crop
+        return ROI_Y0, HEIGHT
+    return y0, y1
+
+# ============ BATCHED OCR DISPATCH ===================
+
+def _build_keyword_automaton():
+    """Compile OCR_KEYWORDS into one Aho-Corasick DFA (single linear scan).
+
+    Bare digits get space-padded patterns so the word-boundary rule for
+    "4"/"6" is encoded in the automaton itself.
+    """
+    A = ahocorasick.Automaton()
+    for k in OCR_KEYWORDS:
+        A.add_word(f" {k} " if k in ["4", "6"] else k, k)
+    A.make_automaton()
+    return A
+
+KEYWORD_AUTOMATON = _build_keyword_automaton() if AHO_AVAILABLE else None
+
+def match_keyword(text):
+    """Return the first trigger keyword found in OCR text (word-safe for digits)."""
+    padded = f" {text} "
+    if KEYWORD_AUTOMATON is not None:
+        for _, k in KEYWORD_AUTOMATON.iter(padded):
+            return k
+        return None
+    for k in OCR_KEYWORDS:
+        if k in ["4", "6"]:
+            if f" {k} " in padded: return k
+        elif k in text:
+            return k
+    return None
+
+def warmup_ocr(reader, passes=3):
+    """Prime GPU kernels so the first live batch isn't a cold start.
+
+    A few passes on the production ROI shape let cuDNN's autotuner
+    (cudnn_benchmark=True) settle on the fastest conv algorithms and cache
+    them - otherwise the first real event pays a 3-10x latency spike.
+    """
+    try:
+        for _ in range(passes):
+            if hasattr(reader, "readtext_batched"):
+                dummy = np.zeros((OCR_BATCH, ROI_H, ROI_W, 3), np.uint8)
+                reader.readtext_batched(dummy, n_width=ROI_W, n_height=ROI_H, batch_size=OCR_BATCH)
+            else:
+                reader.readtext(np.zeros((ROI_H, ROI_W), np.uint8), detail=0)
+        print("[OCR] Warm-up complete.")
+    except Exception as e:
+        print(f"⚠️ OCR warm-up skipped ({e})")
+
+def run_ocr_batch(reader, batch):
+    """Dispatch buffered (timestamp, roi) pairs in one GPU call.
+
+    Returns [(t, keyword)] hits matched back to their timestamps. Falls back
+    to per-ROI readtext if batched inference is unavailable.
+    """
+    items = list(batch)
+    batch.clear()
+    hits = []
+    try:
+        if hasattr(reader, "readtext_batched") and len(items) > 1:
+            results = reader.readtext_batched(
+                [roi for _, roi in items],
+                n_width=ROI_W, n_height=ROI_H, batch_size=OCR_BATCH
+            )
+            texts = [" ".join(r[1] for r in res).upper() for res in results]
+        else:
+            texts = [" ".join(reader.readtext(roi, detail=0)).upper() for _, roi in items]
+        for (t, _), text in zip(items, texts):
+            k = match_keyword(text)
+            if k:
+                hits.append((t, k))
+    except Exception:
+        pass
+    return hits
+
+# ============ OCR WORKER PROCESS (Shared-Memory Ring) ===================
+# OCR runs in its own process so inference latency spikes never stall the
+# capture loop. ROIs travel through a zero-copy shared-memory ring - only
+# tiny (slot, timestamp, shape) tuples are pickled.
+
+OCR_RING_SLOTS = 16
+
+
+def ocr_worker_main(shm_name, free_slots, jobs, hits):
+    """Worker process: batch ROIs from the ring, run OCR, report keyword hits."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    ring = np.ndarray((OCR_RING_SLOTS, ROI_H, ROI_W), np.uint8, buffer=shm.buf)
+
+    # Pin the ring for faster cudaMemcpy H2D when OpenCV has CUDA (best effort)
+    try:
+        cv2.cuda.registerPageLocked(ring)
+    except Exception:
+        pass
+
+    reader = init_ocr_reader()
+    if reader:
+        warmup_ocr(reader)
+
+    batch = []
+    try:
+        while True:
+            try:
+                job = jobs.get(timeout=OCR_FLUSH_IDLE)
+            except queue.Empty:
+                job = False  # idle - flush whatever we have
+            if job is None:
+                break
+            if job:
+                batch.append(job)
+
+            if reader and batch and (len(batch) >= OCR_BATCH or job is False):
+                items = [(t, ring[slot, :h, :w]) for slot, t, h, w in batch]
+                for hit in run_ocr_batch(reader, items):
+                    hits.put(hit)
+                for _ in batch:
+                    free_slots.release()
+                batch = []
+    finally:
+        shm.close()
+
+
+class OCRWorkerClient:
+    """Main-loop handle for the OCR worker process."""
+
+    def __init__(self):
+        self.shm = shared_memory.SharedMemory(
+            create=True, size=OCR_RING_SLOTS * ROI_H * ROI_W
+        )
+        self.ring = np.ndarray((OCR_RING_SLOTS, ROI_H, ROI_W), np.uint8, buffer=self.shm.buf)
+        self.free_slots = mp.Semaphore(OCR_RING_SLOTS)
+        self.jobs = mp.Queue()
+        self.hits = mp.Queue()
+        self.slot = 0
+        self.proc = mp.Process(
+            target=ocr_worker_main,
+            args=(self.shm.name, self.free_slots, self.jobs, self.hits),
+            daemon=True,
+        )
+        self.proc.start()
+
+    def submit(self, t, roi):
+        # Ring full means OCR is behind - drop the tick, never stall capture
+        if not self.free_slots.acquire(block=False):
+            return
+        h, w = roi.shape
+        # Binarize straight into the ring slot: the slot doubles as the
+        # threshold dst, so no intermediate ROI-sized array is allocated.
+        # Otsu adapts to broadcast brightness shifts the fixed 130 cutoff missed.
+        cv2.threshold(roi, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU,
+                      dst=self.ring[self.slot, :h, :w])
+        self.jobs.put((self.slot, t, h, w))
+        self.slot = (self.slot + 1) % OCR_RING_SLOTS
+
+    def poll_hits(self):
+        out = []
+        while True:
+            try:
+                out.append(self.hits.get_nowait())
+            except queue.Empty:
+                return out
+
+    def close(self):
+        try:
+            self.jobs.put(None)
+            self.proc.join(timeout=3)
+            self.shm.close()
+            self.shm.unlink()
+        except Exception:
+            pass
+
 # ============ AUDIO MONITOR THREAD (Dual Pipe Version) ===================
 
+def audio_rms(samples):
+    """RMS of an int16 chunk (SIMD C kernel when numpy-rms is installed)."""
+    # numpy-rms rejects int16 input (the squares overflow), so both paths
+    # convert to float32 first; the kernel still wins on the sqrt/mean
+    x = samples.astype(np.float32)
+    if NUMPY_RMS_AVAILABLE:
+        return float(numpy_rms.rms(x, x.size)[0])
+    return float(np.sqrt(np.dot(x, x) / x.size))
+
 class AudioMonitor(threading.Thread):
     def __init__(self, pipe_source):
         super().__init__()
@@ -109,75 +503,140 @@ class AudioMonitor(threading.Thread):
         self.trigger = False
         self.sustain_count = 0
     
+    def _read_exact(self, mv):
+        """Fill mv completely. Pipe reads block, so a zero read means EOF."""
+        off = 0
+        while off < len(mv):
+            n = self.pipe.readinto(mv[off:])
+            if not n:
+                return False
+            off += n
+        return True
+
     def run(self):
         print("[AUDIO] Listening for Crowd Roar (via Pipe)...")
-        
+
+        # Best-effort real-time priority so the RMS windows stay evenly
+        # spaced under I/O jitter (needs CAP_SYS_NICE; silently skipped)
+        try:
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(10))
+            print("[AUDIO] Real-time scheduling active.")
+        except (AttributeError, OSError):
+            pass
+
         # Read in 0.1s chunks (4410 samples * 2 bytes = 8820 bytes)
-        chunk_size = 8820 
-        
+        # Reuse one int16 buffer - readinto avoids a fresh bytes object per chunk
+        audio_data = np.empty(4410, dtype=np.int16)
+        chunk_view = memoryview(audio_data).cast('B')
+
         while self.running:
             try:
-                # Read directly from the passed pipe (proc.stderr)
-                raw = self.pipe.read(chunk_size)
-                if not raw or len(raw) != chunk_size: 
-                    # If pipe is empty/closed, wait briefly or break
-                    time.sleep(0.01)
-                    continue
-                
-                # Convert bytes to numpy array
-                audio_data = np.frombuffer(raw, dtype=np.int16)
-                
+                # Block until a full chunk arrives (no sleep polling, no
+                # partial chunks skewing the RMS window)
+                if not self._read_exact(chunk_view):
+                    break  # pipe closed
+
                 # Calculate RMS Amplitude
-                rms = np.sqrt(np.mean(audio_data.astype(np.float32)**2))
-                norm_vol = rms / 20000.0  
+                rms = audio_rms(audio_data)
+                norm_vol = rms / 20000.0
                 
                 self.current_volume = min(norm_vol, 1.0)
                 
-                # Logic: Check for Sustained Loudness
-                if self.current_volume > AUDIO_THRESH:
-                    self.sustain_count += 1
-                else:
-                    self.sustain_count = 0
-                    
+                # Logic: Check for Sustained Loudness (branchless - the
+                # count resets on any quiet chunk without a data-dependent
+                # branch, which is unpredictable over a noisy crowd floor)
+                loud = int(self.current_volume > AUDIO_THRESH)
+                self.sustain_count = (self.sustain_count + loud) * loud
+
                 if self.sustain_count >= AUDIO_SUSTAIN:
                     self.trigger = True
-                    self.sustain_count = 0 
+                    self.sustain_count = 0
             except Exception as e:
                 print(f"[AUDIO ERROR] {e}")
                 break
 
 # ============ CLIPPING & VERTICAL ===================
 
+_CUVID_READY = None
+
+def cuvid_available():
+    """True if ffmpeg exposes the h264_cuvid decoder (cached probe)."""
+    global _CUVID_READY
+    if _CUVID_READY is None:
+        try:
+            out = subprocess.run(["ffmpeg", "-hide_banner", "-decoders"],
+                                 capture_output=True, text=True, timeout=10)
+            _CUVID_READY = "h264_cuvid" in out.stdout
+        except Exception:
+            _CUVID_READY = False
+    return _CUVID_READY
+
 def make_vertical(inp: Path):
     out = final_dir / f"{inp.stem}_V.mp4"
-    vf = "scale=1080:1920:force_original_aspect_ratio=increase,crop=1080:1920"
-    
-    # RTX 4060 OPTIMIZATION: Use h264_nvenc
-    cmd = f"ffmpeg -y -i {inp} -vf \"{vf}\" -c:v h264_nvenc -preset p1 -c:a aac -b:a 128k {out}"
+
+    if cuvid_available():
+        # Full GPU path: NVDEC crops the centre 9:16 window (1920 -> 608px
+        # wide) and resizes to 1080x1920 inside the decoder, so frames go
+        # straight to NVENC without ever touching host memory.
+        cmd = (f"ffmpeg -y -hwaccel cuda -hwaccel_output_format cuda "
+               f"-c:v h264_cuvid -crop 0x0x656x656 -resize 1080x1920 -i {inp} "
+               f"-c:v h264_nvenc -preset p1 -c:a copy {out}")
+    else:
+        vf = "scale=1080:1920:force_original_aspect_ratio=increase,crop=1080:1920"
+        # RTX 4060 OPTIMIZATION: Use h264_nvenc
+        cmd = f"ffmpeg -y -i {inp} -vf \"{vf}\" -c:v h264_nvenc -preset p1 -c:a aac -b:a 128k {out}"
+
     subprocess.call(shlex.split(cmd), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
     print(f"[VERTICAL READY] {out.name}")
 
+# Cap concurrent cut/encode ffmpeg processes - NVENC handles ~2 sessions
+# cleanly; event bursts beyond that queue instead of thrashing the GPU
+CUT_SEMAPHORE = threading.Semaphore(2)
+
 def cut_job(t1, t2, out_path):
-    time.sleep(15) # Wait for disk flush
-    
+    first = int(t1 // SEGMENT_SEC)
+    last = int(t2 // SEGMENT_SEC)
+
+    # Wait only until the segment covering t2 has closed (next one exists),
+    # instead of the old fixed 15s disk-flush sleep
+    deadline = time.time() + 30
+    while not (segments_dir / f"seg_{last + 1:06d}.ts").exists() and time.time() < deadline:
+        time.sleep(0.5)
+
+    segs = [segments_dir / f"seg_{i:06d}.ts" for i in range(first, last + 1)]
+    segs = [s for s in segs if s.exists()]
+    if not segs:
+        print(f"[ERROR] No recorded segments cover {t1:.1f}-{t2:.1f}s")
+        return
+
+    list_file = out_path.with_suffix(".txt")
+    with open(list_file, "w") as f:
+        for s in segs:
+            f.write(f"file '{s}'\n")
+
+    offset = t1 - first * SEGMENT_SEC
     duration = t2 - t1
     cmd = [
         "ffmpeg", "-y",
-        "-ss", f"{t1:.2f}",      
-        "-i", str(record_ts), 
-        "-t", f"{duration:.2f}", 
-        "-map", "0:v", "-map", "0:a", 
-        "-c", "copy", 
+        "-ss", f"{offset:.2f}",
+        "-f", "concat", "-safe", "0",
+        "-i", str(list_file),
+        "-t", f"{duration:.2f}",
+        "-map", "0:v", "-map", "0:a",
+        "-c", "copy",
         "-avoid_negative_ts", "make_zero",
         str(out_path)
     ]
-    
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode == 0:
-        print(f"[CLIP SAVED] {out_path.name}")
-        make_vertical(out_path)
-    else:
-        print(f"[ERROR] FFmpeg failed to cut: {result.stderr}")
+
+    with CUT_SEMAPHORE:
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        try: list_file.unlink()
+        except OSError: pass
+        if result.returncode == 0:
+            print(f"[CLIP SAVED] {out_path.name}")
+            make_vertical(out_path)
+        else:
+            print(f"[ERROR] FFmpeg failed to cut: {result.stderr}")
 
 def cut_ball(t1, t2, reason):
     dur = min(max(t2 - t1, BALL_MIN), BALL_MAX)
@@ -193,12 +652,19 @@ def run_engine(vendor: str):
     cleanup_zombies() 
     url = build_srt_url(vendor)
     
-    # Init OCR
-    reader = None
-    if OCR_AVAILABLE:
-        print("[OCR] Initializing RTX 4060...")
-        reader = easyocr.Reader(['en'], gpu=True) 
-        print("[OCR] System Ready.")
+    # Init OCR - inference lives in its own process (shared-memory ring)
+    ocr_worker = None
+    if OCR_AVAILABLE or RAPIDOCR_AVAILABLE:
+        ocr_worker = OCRWorkerClient()
+        print("[OCR] Worker process started.")
+
+    use_cuda = cuda_cv_available()
+    if use_cuda:
+        print("[GPU] OpenCV CUDA pipeline active (grayscale/diff/threshold on-device).")
+
+    use_nvdec = nvdec_available()
+    if use_nvdec:
+        print("[GPU] NVDEC hardware decode enabled.")
 
     print(f"[SYSTEM LIVE] Watching: Visuals + Audio + Motion")
 
@@ -209,13 +675,23 @@ def run_engine(vendor: str):
         cmd = [
             "ffmpeg", "-y",
             "-err_detect", "ignore_err",
+        ]
+        if use_nvdec:
+            # Decode H.264 on NVDEC so the CPU only handles the pipe copy
+            cmd += ["-hwaccel", "cuda"]
+        cmd += [
             "-i", url,
             
-            # 1. Disk Recording
-            "-map", "0", "-c", "copy", "-f", "mpegts", "-flags", "+global_header", str(record_ts),
+            # 1. Disk Recording (2s segments -> constant-time clip cutting)
+            "-map", "0", "-c", "copy",
+            "-f", "segment", "-segment_time", str(SEGMENT_SEC),
+            "-segment_format", "mpegts", "-reset_timestamps", "1",
+            "-flags", "+global_header", str(segments_dir / "seg_%06d.ts"),
             
-            # 2. Visuals to STDOUT (pipe:1)
-            "-map", "0:v", "-f", "rawvideo", "-pix_fmt", "bgr24", "-an", "pipe:1",
+            # 2. Visuals to STDOUT (pipe:1) - luma plane only: motion and
+            # OCR are grayscale consumers, so shipping BGR24 just to run
+            # cvtColor on it wasted 2/3 of the pipe bandwidth
+            "-map", "0:v", "-f", "rawvideo", "-pix_fmt", "gray", "-an", "pipe:1",
             
             # 3. Audio to STDERR (pipe:2)
             # We treat stderr as a data pipe for audio to avoid a 2nd connection
@@ -235,29 +711,60 @@ def run_engine(vendor: str):
             audio_mon.start()
 
         prev_gray = None
+        gpu_gray = cv2.cuda_GpuMat() if use_cuda else None
+        prev_gpu = cv2.cuda_GpuMat() if use_cuda else None
+        gpu_has_prev = False
+        band = None
+        prev_roi = None
         frame_id = 0
+
+        # One persistent frame buffer - readinto fills it in place each
+        # iteration (no bytes object + frombuffer/reshape per frame).
+        # Single gray plane: 2.1MB/frame instead of 6.2MB BGR.
+        frame = np.empty((HEIGHT, WIDTH), np.uint8)
+        frame_view = memoryview(frame).cast('B')
         ball_start = 0.0
         last_ocr_time = 0.0
         last_data_time = time.time()
 
+        # Multiplex the video pipe through a selector so the watchdog can
+        # fire during a stall (a bare blocking read would sit in readinto
+        # forever and never reach the 10s check)
+        sel = selectors.DefaultSelector()
+        sel.register(proc.stdout, selectors.EVENT_READ)
+
         try:
             while True:
                 # --- Watchdog Check ---
                 if time.time() - last_data_time > 10:
                     print("[WATCHDOG] No data for 10s. Restarting...")
-                    break 
+                    break
+
+                # Wait for video data (times out back into the watchdog)
+                if not sel.select(timeout=2.0):
+                    continue
 
-                # Read Video Frame from stdout
-                raw = proc.stdout.read(WIDTH * HEIGHT * 3)
-                if len(raw) != WIDTH * HEIGHT * 3: 
+                # Read Video Frame from stdout (in-place into the reused buffer)
+                n = proc.stdout.readinto(frame_view)
+                if n != len(frame_view):
                     print("[SRT] Pipe Empty. Possible stream drop.")
                     break
-                
+
                 last_data_time = time.time()
-                frame = np.frombuffer(raw, np.uint8).reshape((HEIGHT, WIDTH, 3))
                 frame_id += 1
                 t = frame_id / FPS
-                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+                # The pipe already carries the luma plane - no cvtColor
+                if use_cuda:
+                    gpu_gray.upload(frame)
+                    gray = None
+                else:
+                    gray = frame
+
+                # Lock onto the scoreboard band once, ~1s into the stream
+                if band is None and frame_id == FPS:
+                    band = calibrate_scoreboard_band(gray if gray is not None else gpu_gray.download())
+                    print(f"[OCR] Scoreboard band locked: rows {band[0]}-{band[1]}")
 
                 # --- A. AUDIO TRIGGER (Checking Monitor) ---
                 if audio_mon and audio_mon.trigger:
@@ -268,41 +775,65 @@ def run_engine(vendor: str):
                     audio_mon.trigger = False
 
                 # --- B. OCR TRIGGER (Visuals) ---
-                if reader and (t - last_ocr_time) > OCR_INTERVAL and (t - ball_start > 5.0):
+                if ocr_worker and (t - last_ocr_time) > OCR_INTERVAL and (t - ball_start > 5.0):
                     last_ocr_time = t
-                    roi = gray[int(HEIGHT*0.75):HEIGHT, int(WIDTH*0.15):int(WIDTH*0.85)]
-                    _, roi_thresh = cv2.threshold(roi, 130, 255, cv2.THRESH_BINARY)
-                    try:
-                        res = reader.readtext(roi_thresh, detail=0)
-                        text = " ".join(res).upper()
-                        for k in OCR_KEYWORDS:
-                            if k in text:
-                                if k in ["4", "6"] and f" {k} " not in f" {text} ": continue
-                                print(f"[EVENT] 👁️ OCR FOUND: {k}")
-                                cut_ball(max(0, t - RUNUP_SEC), t + POST_SEC, reason=f"OCR-{k}")
-                                ball_start = t
-                                break
-                    except: pass
+                    by0, by1 = band if band else (ROI_Y0, HEIGHT)
+                    if use_cuda:
+                        # Only the calibrated band leaves the GPU
+                        roi = cv2.cuda_GpuMat(gpu_gray, (ROI_X0, by0, ROI_W, by1 - by0)).download()
+                    else:
+                        roi = gray[by0:by1, ROI_X0:ROI_X0+ROI_W]
+                    # Dead-frame gate: if the scoreboard region is unchanged
+                    # since the last tick, re-reading it is wasted GPU time
+                    roi_static = (
+                        prev_roi is not None and prev_roi.shape == roi.shape
+                        and cv2.mean(cv2.absdiff(prev_roi, roi))[0] < OCR_ROI_MIN_DIFF
+                    )
+                    # CPU roi is a view into the reused frame buffer - copy it
+                    prev_roi = roi if use_cuda else roi.copy()
+                    if not roi_static:
+                        ocr_worker.submit(t, roi)  # binarizes into the ring in place
+
+                # Collect keyword hits reported back by the worker process
+                if ocr_worker:
+                    for bt, k in ocr_worker.poll_hits():
+                        if bt - ball_start > 5.0:
+                            print(f"[EVENT] 👁️ OCR FOUND: {k}")
+                            cut_ball(max(0, bt - RUNUP_SEC), bt + POST_SEC, reason=f"OCR-{k}")
+                            ball_start = bt
+                            break
 
                 # --- C. MOTION TRIGGER (Action) ---
-                if prev_gray is not None:
-                    diff = cv2.absdiff(prev_gray, gray)
-                    score = np.sum(diff) / (WIDTH * HEIGHT)
-                    if score > SCENE_THRESH and t - ball_start > 8.0:
-                        if score > 20.0: 
-                            print(f"[EVENT] 🏃 MASSIVE MOTION (Score: {score:.1f})")
-                            cut_ball(max(0, t - RUNUP_SEC), t + POST_SEC, reason="Motion")
-                            ball_start = t
-
-                prev_gray = gray
+                score = None
+                if use_cuda:
+                    if gpu_has_prev:
+                        diff_gpu = cv2.cuda.absdiff(prev_gpu, gpu_gray)
+                        score = cv2.cuda.absSum(diff_gpu)[0] / (WIDTH * HEIGHT)
+                    # Ping-pong the two device buffers instead of reallocating
+                    prev_gpu, gpu_gray = gpu_gray, prev_gpu
+                    gpu_has_prev = True
+                else:
+                    small = cv2.resize(gray, (MOTION_W, MOTION_H), interpolation=cv2.INTER_AREA)
+                    if prev_gray is not None:
+                        # cv2.mean = single-pass SIMD reduction (already per-pixel)
+                        score = cv2.mean(cv2.absdiff(prev_gray, small))[0]
+                    prev_gray = small
+
+                if score is not None and score > SCENE_THRESH and t - ball_start > 8.0:
+                    if score > 20.0:
+                        print(f"[EVENT] 🏃 MASSIVE MOTION (Score: {score:.1f})")
+                        cut_ball(max(0, t - RUNUP_SEC), t + POST_SEC, reason="Motion")
+                        ball_start = t
 
         except KeyboardInterrupt:
             print("\n[EXIT] User stopped script.")
+            if ocr_worker: ocr_worker.close()
             proc.terminate()
             sys.exit(0)
             
         finally:
             print("[WATCHDOG] Cleaning up processes...")
+            sel.close()
             if audio_mon: audio_mon.running = False
             proc.terminate()
             try: proc.wait(timeout=2)
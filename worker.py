@@ -11,8 +11,31 @@ import os
 import sys
 import time
 import json
+import itertools
 import subprocess
 import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import jobdb
+
+# Try importing orjson (optional - 2-10x faster job/error serialization,
+# which matters once the pool and batching push queue throughput up)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+    loads = orjson.loads
+except ImportError:
+    ORJSON_AVAILABLE = False
+    loads = json.loads
+
+# Try importing inotify_simple (optional - blocks on queue events instead
+# of waking up every second to poll an empty directory)
+try:
+    from inotify_simple import INotify, flags as inotify_flags
+    INOTIFY_AVAILABLE = True
+except ImportError:
+    INOTIFY_AVAILABLE = False
 
 # --- CONFIGURATION ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -22,222 +45,860 @@ LOGOS_DIR = os.path.join(BASE_DIR, "logos")
 ASSETS_DIR = os.path.join(BASE_DIR, "assets")
 OUTPUT_ROOT = os.path.join(BASE_DIR, "branded_output")
 ERRORS_DIR = os.path.join(BASE_DIR, "errors")
+# ffmpeg stderr logs live apart from ERRORS_DIR: the server watches the
+# errors directory's mtime, so scratch logs there would invalidate its
+# caches on every single encode
+FFMPEG_LOG_DIR = os.path.join(BASE_DIR, "ffmpeg_logs")
 
-for d in [QUEUE_DIR, OUTPUT_ROOT, ERRORS_DIR]:
+for d in [QUEUE_DIR, OUTPUT_ROOT, ERRORS_DIR, FFMPEG_LOG_DIR]:
     os.makedirs(d, exist_ok=True)
 
+def pick_tmp_dir():
+    """
+    Scratch space for tmp_* intermediates. Writing them next to the final
+    output doubled the disk traffic per job; a RAM-backed tmpfs keeps
+    intermediates off disk entirely so only the final file ever hits it.
+    Falls back to the system tmpdir when /dev/shm is missing or tight.
+    """
+    try:
+        if os.path.isdir('/dev/shm') and \
+                shutil.disk_usage('/dev/shm').free >= 4 * 1024 ** 3:
+            shm = '/dev/shm/ai_video_editor'
+            os.makedirs(shm, exist_ok=True)
+            return shm
+    except OSError:
+        pass
+    return tempfile.gettempdir()
+
+TMP_DIR = pick_tmp_dir()
+
 def log(msg):
     print(msg)
     sys.stdout.flush()
 
-def run_ffmpeg(cmd):
+def available_encoders():
+    """Probe once at startup: which encoders does this ffmpeg build expose?"""
     try:
-        # Increase queue size to prevent buffer overflows
-        cmd.extend(['-max_muxing_queue_size', '9999'])
-        result = subprocess.run(
-            cmd, 
-            stdout=subprocess.PIPE, 
-            stderr=subprocess.PIPE,
-            text=True
-        )
-        if result.returncode != 0:
-            raise Exception(f"FFmpeg Failed:\n{result.stderr[-1000:]}")
-        return True
+        out = subprocess.run(['ffmpeg', '-hide_banner', '-encoders'],
+                             stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                             text=True, timeout=10)
+        return out.stdout
+    except Exception:
+        return ""
+
+_ENCODERS = available_encoders()
+NVENC_READY = 'h264_nvenc' in _ENCODERS
+
+# hevc_nvenc is preferred on Ada cards - roughly the same encoder fps as
+# H.264 but ~half the bitrate at equal quality, so finals write (and
+# download) twice as fast. WORKER_VCODEC=h264_nvenc forces H.264 when a
+# downstream consumer can't take HEVC.
+VCODEC = os.environ.get("WORKER_VCODEC") or \
+    ('hevc_nvenc' if 'hevc_nvenc' in _ENCODERS else
+     'h264_nvenc' if NVENC_READY else 'libx264')
+
+# Shared encoder/decoder args - NVENC when present, libx264 as fallback so
+# the worker still runs on boxes without an NVIDIA card
+if VCODEC.endswith('_nvenc'):
+    HWACCEL_ARGS = ['-hwaccel', 'cuda']
+    # New-style NVENC flags, all explicit: p1 with the default hq tune
+    # still does rate-distortion work; ll + no multipass/lookahead/B-frames
+    # is the actual fastest configuration and silences deprecation warnings
+    VIDEO_CODEC_ARGS = ['-c:v', VCODEC, '-preset', 'p1', '-tune', 'll',
+                        '-rc', 'constqp', '-qp', '23', '-multipass', 'disabled',
+                        '-bf', '0', '-g', '60', '-rc-lookahead', '0']
+else:
+    HWACCEL_ARGS = []
+    VIDEO_CODEC_ARGS = ['-c:v', 'libx264', '-preset', 'ultrafast', '-crf', '23']
+
+def encoder_supports(option):
+    """Probe once at startup: does the chosen encoder expose this option?"""
+    try:
+        out = subprocess.run(['ffmpeg', '-hide_banner', '-h', f'encoder={VCODEC}'],
+                             stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                             text=True, timeout=10)
+        return option in out.stdout
+    except Exception:
+        return False
+
+# Split-frame encoding spreads one frame across NVENC's engines - a big
+# throughput win on tall 1080x1920 frames, where a single engine is the
+# bottleneck. Newer builds only, hence the probe. The named constant
+# 'auto' (value 0) lets the driver decide; every numeric value >= 1 is a
+# FORCED split variant, which hurts on single-engine cards like the
+# RTX 4060 this targets. WORKER_SPLIT_ENCODE overrides for tuning.
+if VCODEC.endswith('_nvenc') and encoder_supports('split_encode_mode'):
+    VERTICAL_ENCODE_ARGS = ['-split_encode_mode',
+                            os.environ.get("WORKER_SPLIT_ENCODE", "auto")]
+else:
+    VERTICAL_ENCODE_ARGS = []
+
+def video_args(is_vertical):
+    """Video encoder args for one output, orientation-aware."""
+    return VIDEO_CODEC_ARGS + (VERTICAL_ENCODE_ARGS if is_vertical else [])
+
+def run_ffmpeg(cmd, input_bytes=None):
+    # Increase queue size to prevent buffer overflows
+    cmd.extend(['-max_muxing_queue_size', '9999'])
+
+    # Silence per-frame progress chatter and send what remains straight
+    # to a disk log - Python never decodes or drains a pipe, so there is
+    # zero per-frame overhead and no stall risk on a full pipe buffer
+    cmd[1:1] = ['-nostats', '-loglevel', 'error']
+    log_path = os.path.join(FFMPEG_LOG_DIR,
+                            f"ffmpeg_{os.getpid()}_{int(time.time() * 1000)}.log")
+    with open(log_path, 'wb') as log_fh:
+        proc = subprocess.run(cmd, input=input_bytes,
+                              stdout=subprocess.DEVNULL, stderr=log_fh)
+
+    if proc.returncode != 0:
+        # The log holds errors only (-loglevel error), so the tail is the
+        # diagnosis; the file is kept on disk for postmortem
+        try:
+            with open(log_path, 'rb') as f:
+                f.seek(max(0, os.path.getsize(log_path) - 4000))
+                tail = f.read().decode('utf-8', errors='ignore')
+        except OSError:
+            tail = ""
+        raise Exception(f"FFmpeg Failed (full log: {log_path}):\n{tail[-1000:]}")
+
+    try:
+        os.remove(log_path)
+    except OSError:
+        pass
+    return True
+
+def prune_ffmpeg_logs(max_age=7 * 24 * 3600):
+    """Failure logs are kept for postmortem; drop them after a week."""
+    cutoff = time.time() - max_age
+    try:
+        for entry in os.scandir(FFMPEG_LOG_DIR):
+            if entry.name.endswith('.log') and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+    except OSError:
+        pass
+
+# --- ASSET LOOKUP (one scan at startup, dict lookups per job) ---
+# Resolving "which file serves this asset for this orientation" used to
+# stat the filesystem once per logo/intro/outro per job. The map answers
+# the same question without touching disk: (basename, is_vertical) maps
+# to the _vertical variant when one exists, else the base file. Built at
+# import so pool worker processes inherit it; new asset files are picked
+# up on the next worker restart, same as the prescale/prewarm caches.
+ASSET_MAP = {}
+
+def build_asset_map():
+    amap = {}
+    for d in (LOGOS_DIR, ASSETS_DIR):
+        if not os.path.isdir(d):
+            continue
+        names = {e.name for e in os.scandir(d) if e.is_file()}
+        for name in names:
+            stem, ext = os.path.splitext(name)
+            if stem.endswith('_vertical'):
+                continue
+            vert_name = f"{stem}_vertical{ext}"
+            amap[(name, False)] = os.path.join(d, name)
+            amap[(name, True)] = os.path.join(
+                d, vert_name if vert_name in names else name)
+    ASSET_MAP.clear()
+    ASSET_MAP.update(amap)
+
+build_asset_map()
+
+# --- LOGO PRE-SCALING (scale once at startup, never inside a job graph) ---
+LOGO_CACHE_DIR = os.path.join(BASE_DIR, ".logo_cache")
+os.makedirs(LOGO_CACHE_DIR, exist_ok=True)
+
+# Logos ship as full-frame overlay canvases (transparent except where the
+# designer placed the artwork) and are composited 1:1 at 0:0, so the
+# prescale target is the whole output geometry - never a badge-sized
+# thumbnail, which would shrink the entire canvas into a corner
+LOGO_CANVAS = {False: "1920x1080", True: "1080x1920"}
+
+def get_prescaled_logo(logo_path, is_vertical):
+    """
+    Returns a cached copy of the logo canvas scaled to the exact output
+    geometry (keyed by source mtime). The job graph then stays
+    overlay-only and the overlay input always matches the frame size.
+    """
+    if not logo_path or not os.path.exists(logo_path):
+        return logo_path
+    canvas = LOGO_CANVAS[is_vertical]
+    mtime = int(os.path.getmtime(logo_path))
+    name, ext = os.path.splitext(os.path.basename(logo_path))
+    cached = os.path.join(LOGO_CACHE_DIR, f"{name}_{canvas}_{mtime}{ext or '.png'}")
+    if os.path.exists(cached):
+        return cached
+    try:
+        run_ffmpeg(['ffmpeg', '-y', '-i', logo_path,
+                    '-vf', f"scale={canvas.replace('x', ':')}", cached])
+        return cached
     except Exception as e:
-        raise e
+        log(f"⚠️ Logo pre-scale failed ({e}); using original")
+        return logo_path
 
-def get_vertical_asset(original_path):
-    if not original_path: return None
-    dir_name, filename = os.path.split(original_path)
-    name, ext = os.path.splitext(filename)
-    vert_path = os.path.join(dir_name, f"{name}_vertical{ext}")
-    return vert_path if os.path.exists(vert_path) else original_path
+def prescale_logos():
+    """Warm the logo cache at startup so the first job pays nothing."""
+    if not os.path.isdir(LOGOS_DIR):
+        return
+    for entry in os.scandir(LOGOS_DIR):
+        if entry.name.lower().endswith(('.png', '.jpg', '.jpeg')):
+            get_prescaled_logo(entry.path, False)
+            get_prescaled_logo(entry.path, True)
+
+def prewarm_assets():
+    """
+    Normalize every intro/outro variant for both orientations at startup.
+    The encodes are per-asset-mtime cached, so this costs nothing after
+    the first boot but guarantees no job ever waits on an asset encode.
+    """
+    for base in ("intro.mp4", "outro.mp4"):
+        path = ASSET_MAP.get((base, False))
+        if path:
+            get_normalized_asset(path, False)
+        # Vertical jobs fall back to the base asset when no _vertical
+        # variant exists, so normalize whichever file they would pick
+        vert = ASSET_MAP.get((base, True))
+        if vert:
+            get_normalized_asset(vert, True)
 
 # --- STEP 0: NUCLEAR SANITIZATION (THE REAL FIX) ---
-def sanitize_source(input_path, output_path):
+def probe_audio_duration(path):
+    """Audio stream duration in seconds, or None if unprobeable."""
+    try:
+        out = subprocess.run(
+            ['ffprobe', '-v', 'quiet', '-select_streams', 'a:0',
+             '-show_entries', 'stream=duration',
+             '-of', 'default=noprint_wrappers=1:nokey=1', path],
+            stdout=subprocess.PIPE, text=True, timeout=30)
+        return float(out.stdout.strip())
+    except Exception:
+        return None
+
+def sanitize_source(input_path, output_path, is_vertical=False):
     """
-    Re-encodes the input to force frame-perfect trimming.
-    This guarantees Video stops EXACTLY when Audio stops.
+    Fixes the last-second freeze: video must stop EXACTLY when audio stops.
+    The freeze is really a container/timestamp problem, so try a remux
+    first - regenerate PTS and cut at the audio end with -c copy, which
+    runs at disk speed. Only re-encode when the remux doesn't hold up.
     """
     log(f"... Pipeline: Sanitizing Source (Frame-Perfect Trim)")
+
+    audio_end = probe_audio_duration(input_path)
+    if audio_end:
+        try:
+            run_ffmpeg(['ffmpeg', '-y', '-fflags', '+genpts', '-i', input_path,
+                        '-c', 'copy', '-avoid_negative_ts', 'make_zero',
+                        '-to', f"{audio_end:.3f}", output_path])
+            # Sanity check: the remux must produce a parseable file
+            if probe_streams(output_path):
+                log("... Sanitize: remux fast path (no re-encode)")
+                return
+        except Exception as e:
+            log(f"... Sanitize: remux failed ({e}); falling back to re-encode")
+
+    # CRITICAL: Stop video exactly when audio does. With a known audio
+    # duration the frame budget is exact (-to plus -frames:v), letting
+    # NVENC pre-plan instead of discovering the end via -shortest - the
+    # reactive mode behind the very freeze this stage fixes.
+    if audio_end:
+        end_args = ['-to', f"{audio_end:.3f}", '-frames:v', str(int(audio_end * 25))]
+    else:
+        end_args = ['-shortest']
+
     cmd = [
         'ffmpeg', '-y',
-        '-hwaccel', 'cuda',         # Use GPU for decoding
+        *HWACCEL_ARGS,              # Use GPU for decoding when available
         '-fflags', '+genpts',       # Fix timestamps
         '-i', input_path,
-        
+
         # VIDEO: Re-encode to allow cutting at ANY frame (not just keyframes)
-        '-c:v', 'h264_nvenc', '-preset', 'p1', 
-        
+        *video_args(is_vertical),
+
         # AUDIO: Re-encode to AAC to ensure clean headers
-        '-c:a', 'aac', 
-        
-        # CRITICAL: Stop writing video the moment audio ends
-        '-shortest',
-        
-        # SAFETY: Force standard 25fps to prevent variable framerate drifts
-        '-r', '25',
-        
+        '-c:a', 'aac',
+
+        *end_args,
+
+        # SAFETY: Normalize to 25fps on the video stream itself and lock
+        # the muxer to CFR for a deterministic frame count
+        '-vf', 'fps=25',
+        '-fps_mode', 'cfr',
+
         output_path
     ]
     run_ffmpeg(cmd)
 
-# --- STEP 1: APPLY LOGO ---
-def apply_logo(input_path, logo_path, output_path, is_vertical=False):
-    log(f"... Pipeline: Applying Logo (1:1 Overlay)")
-    
-    # Simple 1:1 Overlay
-    filter_complex = (
-        f"[0:v]setpts=PTS-STARTPTS[v_clean];"
-        f"[1:v]setpts=PTS-STARTPTS[logo_layer];"
-        f"[v_clean][logo_layer]overlay=0:0[outv];"
-        f"[0:a]aresample=48000:async=1,asetpts=PTS-STARTPTS[outa]"
-    )
-    
-    cmd = [
-        'ffmpeg', '-y', '-hwaccel', 'cuda',
-        '-i', input_path,
-        '-loop', '1', '-i', logo_path,
-        '-filter_complex', filter_complex,
-        '-map', '[outv]', '-map', '[outa]',
-        '-c:v', 'h264_nvenc', '-preset', 'p1', '-rc', 'constqp', '-qp', '23',
-        '-c:a', 'aac', '-b:a', '128k',
-        # Safety: Use shortest again just in case logo loop causes issues
-        '-shortest', 
+def is_already_clean(path):
+    """
+    True when the source already matches what sanitize_source produces:
+    25fps h264 video, 48kHz AAC audio, and video ending with the audio
+    (within one frame). Such inputs have nothing to fix, so they skip the
+    full decode+encode of stage 0 entirely.
+    """
+    try:
+        out = subprocess.run(
+            ['ffprobe', '-v', 'quiet', '-print_format', 'json',
+             '-show_entries',
+             'stream=codec_type,codec_name,avg_frame_rate,sample_rate,duration',
+             path], stdout=subprocess.PIPE, text=True, timeout=30)
+        streams = loads(out.stdout).get('streams', [])
+        video = next((s for s in streams if s.get('codec_type') == 'video'), None)
+        audio = next((s for s in streams if s.get('codec_type') == 'audio'), None)
+        if not video or not audio:
+            return False
+        if video.get('codec_name') != 'h264' or \
+                video.get('avg_frame_rate') != '25/1':
+            return False
+        if audio.get('codec_name') != 'aac' or \
+                audio.get('sample_rate') != '48000':
+            return False
+        # The freeze being fixed IS a video/audio duration mismatch
+        return abs(float(video['duration']) - float(audio['duration'])) < 1 / 25
+    except Exception:
+        return False
+
+# --- ASSET NORMALIZATION (makes stream-copy concat the common case) ---
+ASSET_CACHE_DIR = os.path.join(ASSETS_DIR, "cache")
+os.makedirs(ASSET_CACHE_DIR, exist_ok=True)
+
+def get_normalized_asset(path, is_vertical):
+    """
+    Returns a cached copy of an intro/outro re-encoded once with the same
+    encoder, 25fps and AAC-48k as sanitized clips, at the target geometry
+    (keyed by source mtime). With both sides matching, the concat demuxer
+    can stream-copy the join instead of re-encoding the whole video.
+    """
+    if not path or not os.path.exists(path):
+        return path
+    target_res = "1080:1920" if is_vertical else "1920:1080"
+    mtime = int(os.path.getmtime(path))
+    name, _ = os.path.splitext(os.path.basename(path))
+    cached = os.path.join(
+        ASSET_CACHE_DIR, f"{name}_{target_res.replace(':', 'x')}_{mtime}.mp4")
+    if os.path.exists(cached):
+        return cached
+    try:
+        run_ffmpeg(['ffmpeg', '-y', '-i', path,
+                    '-vf', (f"scale={target_res}:force_original_aspect_ratio=increase,"
+                            f"crop={target_res},setsar=1,fps=25"),
+                    *video_args(is_vertical),
+                    '-c:a', 'aac', '-ar', '48000',
+                    cached])
+        return cached
+    except Exception as e:
+        log(f"⚠️ Asset normalize failed ({e}); using original")
+        return path
+
+# --- STREAM-COPY CONCAT (intro/outro without re-encoding) ---
+_probe_cache = {}
+
+def probe_streams(path):
+    """Stream facts used for copy-concat compatibility (cached per mtime)."""
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    hit = _probe_cache.get(path)
+    if hit and hit[0] == mtime:
+        return hit[1]
+    try:
+        out = subprocess.run(
+            ['ffprobe', '-v', 'quiet', '-print_format', 'json', '-show_streams', path],
+            stdout=subprocess.PIPE, text=True, timeout=30)
+        facts = tuple(sorted(
+            (s.get('codec_type'), s.get('codec_name'), s.get('width'), s.get('height'),
+             s.get('pix_fmt'), s.get('sample_rate'), s.get('channels'))
+            for s in loads(out.stdout).get('streams', [])))
+    except Exception:
+        facts = None
+    _probe_cache[path] = (mtime, facts)
+    return facts
+
+def streams_compatible(*paths):
+    facts = [probe_streams(p) for p in paths]
+    return all(f is not None and f == facts[0] for f in facts)
+
+def concat_copy(paths, output_path):
+    """
+    Joins already-matching files with the concat demuxer and -c copy.
+    Pure bitstream muxing - runs at disk speed, no decode or encode.
+    The listing is piped over stdin, so no temp list file touches disk.
+    """
+    log("... Pipeline: Stream-copy concat (codecs match, no re-encode)")
+    listing = "".join(f"file '{os.path.abspath(p)}'\n" for p in paths)
+    run_ffmpeg(['ffmpeg', '-y', '-f', 'concat', '-safe', '0',
+                '-protocol_whitelist', 'pipe,file,crypto',
+                '-i', 'pipe:0', '-c', 'copy', output_path],
+               input_bytes=listing.encode())
+
+# --- STEP 1: FUSED BRANDING (Logo + Intro + Outro in ONE pass) ---
+def _fused_graph(has_logo, has_intro, has_outro, is_vertical, norm_audio=True):
+    """Filter_complex text for one branding combination. Input order is
+    fixed: main clip, then logo, intro, outro as present. norm_audio=False
+    (only valid without concat) leaves audio untouched for -c:a copy."""
+    target_res = "1080:1920" if is_vertical else "1920:1080"
+    norm_v = (f"scale={target_res}:force_original_aspect_ratio=increase,"
+              f"crop={target_res},setsar=1,fps=25,setpts=PTS-STARTPTS")
+    norm_a = "aresample=48000:async=1,asetpts=PTS-STARTPTS"
+
+    filters = [f"[0:v]{norm_v}[v_main]"]
+    if norm_audio:
+        filters.append(f"[0:a]{norm_a}[a_main]")
+    idx = 1
+
+    # Logo overlays the main branch before any concat. The loop filter
+    # repeats the one decoded frame from its cache - unlike the demuxer
+    # -loop flag, the PNG is never decoded again per output frame
+    v_main = "[v_main]"
+    if has_logo:
+        filters.append(
+            f"[{idx}:v]loop=loop=-1:size=1,setpts=PTS-STARTPTS[logo_layer]")
+        filters.append(f"{v_main}[logo_layer]overlay=0:0[v_branded]")
+        v_main = "[v_branded]"
+        idx += 1
+
+    segments = []
+    if has_intro:
+        filters.append(f"[{idx}:v]{norm_v}[v_intro]")
+        filters.append(f"[{idx}:a]{norm_a}[a_intro]")
+        segments.append(("[v_intro]", "[a_intro]"))
+        idx += 1
+    segments.append((v_main, "[a_main]"))
+    if has_outro:
+        filters.append(f"[{idx}:v]{norm_v}[v_outro]")
+        filters.append(f"[{idx}:a]{norm_a}[a_outro]")
+        segments.append(("[v_outro]", "[a_outro]"))
+        idx += 1
+
+    if len(segments) == 1:
+        outv = segments[0][0]
+        outa = "[a_main]" if norm_audio else None
+    else:
+        joined = "".join(v + a for v, a in segments)
+        filters.append(f"{joined}concat=n={len(segments)}:v=1:a=1[outv][outa]")
+        outv, outa = "[outv]", "[outa]"
+
+    return ";".join(filters), outv, outa
+
+# Only a handful of branding combinations exist, so every graph string is
+# built once at import - per-job "assembly" is a dict lookup, keeping the
+# hot path allocation-free. Keys: (logo, intro, outro, vertical, norm_audio);
+# the norm_audio=False variants only exist where no concat is involved.
+FUSED_GRAPHS = {}
+for _key in itertools.product((False, True), repeat=4):
+    if not any(_key[:3]):
+        continue
+    FUSED_GRAPHS[_key + (True,)] = _fused_graph(*_key)
+    if not (_key[1] or _key[2]):
+        FUSED_GRAPHS[_key + (False,)] = _fused_graph(*_key, norm_audio=False)
+
+def audio_codec(path):
+    """Codec name of the first audio stream, from the probe cache."""
+    for s in probe_streams(path) or ():
+        if s[0] == 'audio':
+            return s[1]
+    return None
+
+def source_matches_aspect(path, is_vertical):
+    """True when the video already has the target geometry's aspect ratio."""
+    tw, th = (1080, 1920) if is_vertical else (1920, 1080)
+    for s in probe_streams(path) or ():
+        if s[0] == 'video' and s[2] and s[3]:
+            return s[2] * th == s[3] * tw
+    return False
+
+def build_fused_command(input_path, output_path, logo_path, intro_path, outro_path, is_vertical=False):
+    """
+    Assembles one filter_complex command covering every requested branding
+    step. The old chain re-decoded and re-encoded the clip per stage (up
+    to 3x); fusing the graph pays the decode+encode cost exactly once.
+    """
+    # Without a concat there is nothing forcing an audio re-encode: if the
+    # source audio is already AAC, pass it through untouched - faster and
+    # no second lossy generation
+    copy_audio = not (intro_path or outro_path) and audio_codec(input_path) == 'aac'
+    graph, outv, outa = FUSED_GRAPHS[
+        (bool(logo_path), bool(intro_path), bool(outro_path), is_vertical,
+         not copy_audio)]
+
+    # The concat filter pads short audio with silence inside each segment
+    # (all but the last run at their longest stream), so once an outro is
+    # joined the output-level -shortest can no longer trim main video that
+    # outlasts its audio - the very stage-0 defect. Bound the main input
+    # itself at the audio end before it ever enters the graph.
+    main_opts = []
+    if intro_path or outro_path:
+        audio_end = probe_audio_duration(input_path)
+        if audio_end:
+            main_opts = ['-t', f"{audio_end:.3f}"]
+
+    inputs = [*main_opts, '-i', input_path]
+    if logo_path:
+        inputs += ['-i', logo_path]
+    if intro_path:
+        inputs += ['-i', intro_path]
+    if outro_path:
+        inputs += ['-i', outro_path]
+
+    audio_args = ['-c:a', 'copy'] if copy_audio else ['-c:a', 'aac', '-b:a', '128k']
+
+    return [
+        'ffmpeg', '-y', *HWACCEL_ARGS,
+        '-fflags', '+genpts',       # Fix timestamps (was sanitize_source's job)
+        *inputs,
+        '-filter_complex', graph,
+        '-map', outv, '-map', outa if outa else '0:a',
+        *video_args(is_vertical),
+        *audio_args,
+        # Stop writing video the moment audio ends (the freeze fix)
+        '-shortest',
         output_path
     ]
-    run_ffmpeg(cmd)
 
-# --- STEP 2: PREPEND INTRO ---
-def prepend_intro(current_video, intro_path, output_path, is_vertical=False):
-    log(f"... Pipeline: Prepending Intro")
-    target_res = "1080:1920" if is_vertical else "1920:1080"
-    
-    filter_complex = (
-        f"[0:v]scale={target_res}:force_original_aspect_ratio=increase,crop={target_res},setsar=1,fps=25,setpts=PTS-STARTPTS[v0];"
-        f"[0:a]aresample=48000:async=1,asetpts=PTS-STARTPTS[a0];"
-        f"[1:v]scale={target_res}:force_original_aspect_ratio=increase,crop={target_res},setsar=1,fps=25,setpts=PTS-STARTPTS[v1];"
-        f"[1:a]aresample=48000:async=1,asetpts=PTS-STARTPTS[a1];"
-        f"[v0][a0][v1][a1]concat=n=2:v=1:a=1[outv][outa]"
+def cuda_filters_available():
+    """Probe once at startup: does this ffmpeg build ship the CUDA filters?"""
+    if not NVENC_READY:
+        return False
+    try:
+        out = subprocess.run(['ffmpeg', '-hide_banner', '-filters'],
+                             stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                             text=True, timeout=10)
+        return 'overlay_cuda' in out.stdout and 'scale_cuda' in out.stdout
+    except Exception:
+        return False
+
+CUDA_FILTERS_READY = cuda_filters_available()
+
+def build_gpu_logo_command(input_path, output_path, logo_path, is_vertical=False):
+    """
+    Logo-only jobs on a CUDA build: with -hwaccel_output_format cuda the
+    decoded frames stay in VRAM through scale_cuda and overlay_cuda all
+    the way into NVENC - no per-frame download/upload over PCIe. Only the
+    tiny logo image is uploaded, once. Concat jobs still use the CPU
+    graph because concat forces frames back to system memory anyway.
+    """
+    w, h = ("1080", "1920") if is_vertical else ("1920", "1080")
+    graph = (
+        f"[0:v]scale_cuda={w}:{h},fps=25,setpts=PTS-STARTPTS[base];"
+        # overlay_cuda only takes nv12/yuv420p/yuva420p overlay frames -
+        # yuva420p keeps the alpha channel the canvas depends on
+        f"[1:v]format=yuva420p,loop=loop=-1:size=1,hwupload_cuda[logo];"
+        f"[base][logo]overlay_cuda=x=0:y=0[outv]"
     )
-    cmd = [
-        'ffmpeg', '-y', '-hwaccel', 'cuda',
-        '-i', intro_path,
-        '-i', current_video,
-        '-filter_complex', filter_complex,
-        '-map', '[outv]', '-map', '[outa]',
-        '-c:v', 'h264_nvenc', '-preset', 'p1', '-rc', 'constqp', '-qp', '23',
-        '-c:a', 'aac', '-b:a', '128k',
+    # AAC sources pass audio through untouched (no generation loss)
+    if audio_codec(input_path) == 'aac':
+        audio_map, audio_args = '0:a', ['-c:a', 'copy']
+    else:
+        graph += ";[0:a]aresample=48000:async=1,asetpts=PTS-STARTPTS[outa]"
+        audio_map, audio_args = '[outa]', ['-c:a', 'aac', '-b:a', '128k']
+    return [
+        'ffmpeg', '-y',
+        '-hwaccel', 'cuda', '-hwaccel_output_format', 'cuda',
+        '-fflags', '+genpts',
+        '-i', input_path,
+        '-i', logo_path,
+        '-filter_complex', graph,
+        '-map', '[outv]', '-map', audio_map,
+        *video_args(is_vertical),
+        *audio_args,
+        '-shortest',
         output_path
     ]
-    run_ffmpeg(cmd)
 
-# --- STEP 3: APPEND OUTRO ---
-def append_outro(current_video, outro_path, output_path, is_vertical=False):
-    log(f"... Pipeline: Appending Outro")
+def encode_fused(input_path, output_path, logo_path, intro_path, outro_path, is_vertical=False):
+    # scale_cuda stretches to the target geometry (there is no GPU-side
+    # crop), so only aspect-matching sources may take the GPU graph; a
+    # failure there falls through to the CPU graph instead of killing
+    # the job, since the CPU path handles every input the GPU one does
+    if CUDA_FILTERS_READY and logo_path and not intro_path and not outro_path \
+            and source_matches_aspect(input_path, is_vertical):
+        log("... Pipeline: GPU-resident graph (Logo) in one pass")
+        try:
+            run_ffmpeg(build_gpu_logo_command(input_path, output_path,
+                                              logo_path, is_vertical))
+            return
+        except Exception as e:
+            log(f"⚠️ GPU graph failed ({e}); falling back to CPU graph")
+    steps = [name for name, p in
+             [("Logo", logo_path), ("Intro", intro_path), ("Outro", outro_path)] if p]
+    log(f"... Pipeline: Fused graph ({' + '.join(steps)}) in one pass")
+    run_ffmpeg(build_fused_command(input_path, output_path, logo_path,
+                                   intro_path, outro_path, is_vertical))
+
+# --- BATCH ENCODING (several same-branding jobs, one NVENC session) ---
+def build_batch_command(specs, logo_path, intro_path, outro_path, is_vertical):
+    """
+    One ffmpeg invocation encoding several jobs that share identical
+    branding: each main input gets its own filter branch and output file,
+    while the logo/intro/outro are decoded once and split across the
+    branches. Process startup and NVENC session init are paid once for
+    the whole group. specs is a list of (input_path, output_path).
+    """
+    n = len(specs)
     target_res = "1080:1920" if is_vertical else "1920:1080"
+    norm_v = (f"scale={target_res}:force_original_aspect_ratio=increase,"
+              f"crop={target_res},setsar=1,fps=25,setpts=PTS-STARTPTS")
+    norm_a = "aresample=48000:async=1,asetpts=PTS-STARTPTS"
 
-    filter_complex = (
-        f"[0:v]scale={target_res}:force_original_aspect_ratio=increase,crop={target_res},setsar=1,fps=25,setpts=PTS-STARTPTS[v0];"
-        f"[0:a]aresample=48000:async=1,asetpts=PTS-STARTPTS[a0];"
-        f"[1:v]scale={target_res}:force_original_aspect_ratio=increase,crop={target_res},setsar=1,fps=25,setpts=PTS-STARTPTS[v1];"
-        f"[1:a]aresample=48000:async=1,asetpts=PTS-STARTPTS[a1];"
-        f"[v0][a0][v1][a1]concat=n=2:v=1:a=1[outv][outa]"
-    )
+    inputs = []
+    for src, _ in specs:
+        # Per-input options bind only to the next -i, so every main needs
+        # its own hw decode and +genpts - a global prefix would cover just
+        # the first and leave mains 2..N without the timestamp fix
+        main_opts = [*HWACCEL_ARGS, '-fflags', '+genpts']
+        # Same trim rule as build_fused_command: concat pads short audio
+        # with silence, so each main is bounded at its own audio end
+        if intro_path or outro_path:
+            audio_end = probe_audio_duration(src)
+            if audio_end:
+                main_opts += ['-t', f"{audio_end:.3f}"]
+        inputs += [*main_opts, '-i', src]
 
-    cmd = [
-        'ffmpeg', '-y', '-hwaccel', 'cuda',
-        '-i', current_video,
-        '-i', outro_path,
-        '-filter_complex', filter_complex,
-        '-map', '[outv]', '-map', '[outa]',
-        '-c:v', 'h264_nvenc', '-preset', 'p1',
-        '-c:a', 'aac', '-b:a', '128k',
-        output_path
-    ]
-    run_ffmpeg(cmd)
+    filters = []
+    idx = n
+    if logo_path:
+        inputs += ['-i', logo_path]
+        fan = "".join(f"[logo{i}]" for i in range(n))
+        filters.append(f"[{idx}:v]loop=loop=-1:size=1,setpts=PTS-STARTPTS,"
+                       f"split={n}{fan}")
+        idx += 1
+    if intro_path:
+        inputs += ['-i', intro_path]
+        filters.append(f"[{idx}:v]{norm_v},split={n}"
+                       + "".join(f"[vi{i}]" for i in range(n)))
+        filters.append(f"[{idx}:a]{norm_a},asplit={n}"
+                       + "".join(f"[ai{i}]" for i in range(n)))
+        idx += 1
+    if outro_path:
+        inputs += ['-i', outro_path]
+        filters.append(f"[{idx}:v]{norm_v},split={n}"
+                       + "".join(f"[vo{i}]" for i in range(n)))
+        filters.append(f"[{idx}:a]{norm_a},asplit={n}"
+                       + "".join(f"[ao{i}]" for i in range(n)))
+        idx += 1
+
+    out_args = []
+    for i, (_, dst) in enumerate(specs):
+        filters.append(f"[{i}:v]{norm_v}[vm{i}]")
+        filters.append(f"[{i}:a]{norm_a}[am{i}]")
+        v = f"[vm{i}]"
+        if logo_path:
+            filters.append(f"{v}[logo{i}]overlay=0:0[vb{i}]")
+            v = f"[vb{i}]"
+        segments = []
+        if intro_path:
+            segments.append((f"[vi{i}]", f"[ai{i}]"))
+        segments.append((v, f"[am{i}]"))
+        if outro_path:
+            segments.append((f"[vo{i}]", f"[ao{i}]"))
+        if len(segments) == 1:
+            outv, outa = segments[0]
+        else:
+            joined = "".join(sv + sa for sv, sa in segments)
+            filters.append(
+                f"{joined}concat=n={len(segments)}:v=1:a=1[outv{i}][outa{i}]")
+            outv, outa = f"[outv{i}]", f"[outa{i}]"
+        out_args += ['-map', outv, '-map', outa, *video_args(is_vertical),
+                     '-c:a', 'aac', '-b:a', '128k', '-shortest', dst]
+
+    return ['ffmpeg', '-y', *inputs,
+            '-filter_complex', ";".join(filters), *out_args]
+
+def batch_key(job):
+    """Jobs may share one invocation only if every setting matches."""
+    return (job.get('match'), job.get('logo'),
+            bool(job.get('use_intro', False)), bool(job.get('use_outro', False)),
+            is_vertical_name(job.get('filename', '')))
+
+def process_batch(jobs):
+    """
+    Encodes a group of same-branding jobs in one ffmpeg run. Falls back
+    to per-job processing if the batch cannot be built or fails - a bad
+    input then only poisons its own job.
+    """
+    if len(jobs) == 1:
+        return process_video(jobs[0])
+
+    resolved = [resolve_job(j) for j in jobs]
+    first = next((r for r in resolved if r), None)
+    if first is None or any(
+            r is None or not r['logo'] for r in resolved):
+        # Missing sources or no logo burn-in (where the concat fast path
+        # beats a batch re-encode) - handle jobs individually
+        for job in jobs:
+            process_video(job)
+        return
+
+    log(f"\n⚡ Batch of {len(jobs)} jobs (shared branding, one encoder session)")
+    ts = f"{os.getpid()}_{int(time.time())}"
+    specs = [(r['original'], os.path.join(TMP_DIR, f"tmp_batch_{ts}_{i}.mp4"))
+             for i, r in enumerate(resolved)]
+    try:
+        run_ffmpeg(build_batch_command(specs, first['logo'], first['intro'],
+                                       first['outro'], first['is_vertical']))
+        for r, (_, tmp_out) in zip(resolved, specs):
+            if os.path.exists(r['final_output']):
+                os.remove(r['final_output'])
+            shutil.move(tmp_out, r['final_output'])
+            err_file = os.path.join(ERRORS_DIR, f"{r['filename']}.json")
+            if os.path.exists(err_file):
+                os.remove(err_file)
+            log(f"✅ Job Complete: final_{r['filename']}")
+    except Exception as e:
+        log(f"⚠️ Batch failed ({e}); retrying jobs individually")
+        for _, tmp_out in specs:
+            try: os.remove(tmp_out)
+            except OSError: pass
+        for job in jobs:
+            process_video(job)
 
 # --- ORCHESTRATOR ---
-def process_video(job):
+def is_vertical_name(filename):
+    return "_V.mp4" in filename or "_V.mov" in filename
+
+def resolve_job(job):
+    """
+    Turns a queue entry into concrete paths: source video, branding
+    assets that actually exist, and the final output location. Returns
+    None when the source file cannot be found.
+    """
     filename = job.get('filename')
     match_name = job.get('match')
     subfolder = job.get('subfolder')
     logo_name = job.get('logo')
-    use_intro = job.get('use_intro', False)
-    use_outro = job.get('use_outro', False)
+    is_vertical = is_vertical_name(filename)
 
-    is_vertical = "_V.mp4" in filename or "_V.mov" in filename
-    mode_label = "REEL (9:16)" if is_vertical else "STANDARD (16:9)"
+    # One stat per candidate location, stop at the first hit
+    fallback_sub = "Reel" if is_vertical else "Full Screen"
+    original_video = None
+    for sub in (subfolder, fallback_sub):
+        candidate = os.path.join(MATCHES_ROOT, match_name, sub, filename)
+        if os.path.exists(candidate):
+            original_video = candidate
+            break
+    if original_video is None:
+        return None
 
-    log(f"\n⚡ Processing Job: {filename} | Mode: {mode_label}")
+    # Asset Selection - dict lookups, no filesystem stats
+    logo_path = ASSET_MAP.get((logo_name, is_vertical)) if logo_name else None
+    if logo_path:
+        logo_path = get_prescaled_logo(logo_path, is_vertical)
 
-    original_video = os.path.join(MATCHES_ROOT, match_name, subfolder, filename)
-    if not os.path.exists(original_video):
-        fallback_sub = "Reel" if is_vertical else "Full Screen"
-        original_video = os.path.join(MATCHES_ROOT, match_name, fallback_sub, filename)
-        if not os.path.exists(original_video):
-            log(f"❌ Error: Source file not found: {filename}")
-            return False
+    intro_path = outro_path = None
+    if job.get('use_intro', False):
+        intro_path = ASSET_MAP.get(("intro.mp4", is_vertical))
+    if job.get('use_outro', False):
+        outro_path = ASSET_MAP.get(("outro.mp4", is_vertical))
 
-    # Asset Selection
-    logo_path = None
-    if logo_name:
-        base_logo = os.path.join(LOGOS_DIR, logo_name)
-        logo_path = get_vertical_asset(base_logo) if is_vertical else base_logo
+    match_output_dir = os.path.join(OUTPUT_ROOT, match_name)
+    os.makedirs(match_output_dir, exist_ok=True)
 
-    base_intro = os.path.join(ASSETS_DIR, "intro.mp4")
-    intro_path = get_vertical_asset(base_intro) if is_vertical else base_intro
+    return {
+        'filename': filename,
+        'is_vertical': is_vertical,
+        'original': original_video,
+        'output_dir': match_output_dir,
+        'final_output': os.path.join(match_output_dir, f"final_{filename}"),
+        'logo': logo_path,
+        'intro': intro_path,
+        'outro': outro_path,
+    }
 
-    base_outro = os.path.join(ASSETS_DIR, "outro.mp4")
-    outro_path = get_vertical_asset(base_outro) if is_vertical else base_outro
+def process_video(job):
+    filename = job.get('filename')
 
-    # Prepare Outputs
-    match_output_dir = os.path.join(OUTPUT_ROOT, match_name)
-    os.makedirs(match_output_dir, exist_ok=True)
-    
-    final_output = os.path.join(match_output_dir, f"final_{filename}")
-    ts = int(time.time())
-    
-    # Temporary Files
-    tmp_sanitized = os.path.join(match_output_dir, f"tmp_clean_{ts}.mp4")
-    tmp_logo = os.path.join(match_output_dir, f"tmp_logo_{ts}.mp4")
-    tmp_intro = os.path.join(match_output_dir, f"tmp_intro_{ts}.mp4")
-    tmp_outro = os.path.join(match_output_dir, f"tmp_outro_{ts}.mp4")
+    resolved = resolve_job(job)
+    if resolved is None:
+        log(f"❌ Error: Source file not found: {filename}")
+        return False
+
+    is_vertical = resolved['is_vertical']
+    mode_label = "REEL (9:16)" if is_vertical else "STANDARD (16:9)"
+    log(f"\n⚡ Processing Job: {filename} | Mode: {mode_label}")
+
+    original_video = resolved['original']
+    final_output = resolved['final_output']
+    # Temporary Files (pid-qualified - concurrent jobs share the scratch
+    # dir; TMP_DIR is tmpfs when available, so intermediates stay in RAM)
+    ts = f"{os.getpid()}_{int(time.time())}"
+    tmp_sanitized = os.path.join(TMP_DIR, f"tmp_clean_{ts}.mp4")
+    tmp_branded = os.path.join(TMP_DIR, f"tmp_branded_{ts}.mp4")
 
     current_pointer = original_video
     files_to_cleanup = []
 
     try:
-        # STEP 0: SANITIZE (Always run this to fix freeze)
-        sanitize_source(original_video, tmp_sanitized)
-        current_pointer = tmp_sanitized
-        files_to_cleanup.append(tmp_sanitized)
-
-        # STEP A: LOGO
-        if logo_path and os.path.exists(logo_path):
-            apply_logo(current_pointer, logo_path, tmp_logo, is_vertical)
-            current_pointer = tmp_logo
-            files_to_cleanup.append(tmp_logo)
-        
-        # STEP B: INTRO
-        if use_intro and os.path.exists(intro_path):
-            prepend_intro(current_pointer, intro_path, tmp_intro, is_vertical)
-            current_pointer = tmp_intro
-            files_to_cleanup.append(tmp_intro)
-
-        # STEP C: OUTRO
-        if use_outro and os.path.exists(outro_path):
-            append_outro(current_pointer, outro_path, tmp_outro, is_vertical)
-            current_pointer = tmp_outro
-            files_to_cleanup.append(tmp_outro)
+        want_logo = resolved['logo']
+        want_intro = resolved['intro']
+        want_outro = resolved['outro']
+
+        if want_logo or want_intro or want_outro:
+            done = False
+            if not want_logo and (want_intro or want_outro):
+                # Fast path: no logo burn-in means nothing needs re-encoding
+                # beyond the freeze fix. Sanitize (stream copy can't repair
+                # timestamps itself), then splice intro/outro with the concat
+                # demuxer if the normalized clip matches the assets.
+                # This is deliberately sequential, not piped: the join
+                # strategy is chosen by probing the sanitized file, and a
+                # FIFO can only be read once - probing it would consume the
+                # stream the concat step needs. The intermediate lives on
+                # tmpfs anyway, so the handoff already runs at memory speed.
+                if is_already_clean(original_video):
+                    log("... Pipeline: Source already clean - skipping sanitize")
+                    clean_clip = original_video
+                else:
+                    sanitize_source(original_video, tmp_sanitized, is_vertical)
+                    files_to_cleanup.append(tmp_sanitized)
+                    clean_clip = tmp_sanitized
+                # Normalized asset copies share the sanitize encoder params,
+                # so the compatibility probe passes for standard sources
+                seq = [p for p in (get_normalized_asset(want_intro, is_vertical),
+                                   clean_clip,
+                                   get_normalized_asset(want_outro, is_vertical)) if p]
+                if streams_compatible(*seq):
+                    concat_copy(seq, tmp_branded)
+                    done = True
+            if not done:
+                # The fused graph normalizes, fixes timestamps (+genpts) and
+                # trims on audio end (-shortest) itself, so the separate
+                # sanitize decode+encode pass is skipped entirely
+                encode_fused(original_video, tmp_branded,
+                             want_logo, want_intro, want_outro, is_vertical)
+            current_pointer = tmp_branded
+            files_to_cleanup.append(tmp_branded)
+        else:
+            # Bare jobs still need the frame-perfect trim fix - unless the
+            # probe shows there is nothing to fix, in which case the
+            # pointer stays on the original and finalize hardlinks it
+            if is_already_clean(original_video):
+                log("... Pipeline: Source already clean - skipping sanitize")
+            else:
+                sanitize_source(original_video, tmp_sanitized, is_vertical)
+                current_pointer = tmp_sanitized
+                files_to_cleanup.append(tmp_sanitized)
 
         # Finalize
         if os.path.exists(final_output): os.remove(final_output)
 
         if current_pointer == original_video:
-            shutil.copy(original_video, final_output)
+            # No stage ran - publish without copying gigabytes: hardlink is
+            # O(1) on the same filesystem, reflink is O(1) on btrfs/xfs,
+            # and a byte copy is the last resort
+            try:
+                os.link(original_video, final_output)
+            except OSError:
+                try:
+                    subprocess.run(['cp', '--reflink=auto', original_video,
+                                    final_output], check=True)
+                except Exception:
+                    shutil.copy(original_video, final_output)
         else:
-            os.rename(current_pointer, final_output)
+            # shutil.move renames on the same fs and copies across the
+            # tmpfs/disk boundary - either way the output dir sees one write
+            shutil.move(current_pointer, final_output)
         
         log(f"✅ Job Complete: final_{filename}")
         
@@ -249,8 +910,14 @@ def process_video(job):
         log(f"❌ Critical Error: {e}")
         err_path = os.path.join(ERRORS_DIR, f"{filename}.json")
         try:
-            with open(err_path, "w") as f:
-                json.dump({"message": str(e), "timestamp": time.time()}, f)
+            # Atomic publish - the server may read this file mid-write
+            payload = {"message": str(e), "timestamp": time.time()}
+            blob = orjson.dumps(payload) if ORJSON_AVAILABLE \
+                else json.dumps(payload).encode()
+            tmp_path = f"{err_path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(blob)
+            os.rename(tmp_path, err_path)
         except: pass
         return False
         
@@ -260,24 +927,119 @@ def process_video(job):
                 try: os.remove(f)
                 except: pass
 
+# One FFmpeg job rarely saturates the box, so a small pool runs jobs in
+# parallel. Capped at the consumer NVENC session limit - more concurrent
+# encodes than sessions just makes ffmpeg fail to open the encoder.
+NVENC_SESSION_LIMIT = 2
+MAX_JOBS = int(os.environ.get("WORKER_JOBS", "0")) or \
+    max(1, min((os.cpu_count() or 2) // 2, NVENC_SESSION_LIMIT))
+
+# Cap on how many same-branding jobs share one ffmpeg invocation
+BATCH_MAX = 4
+
+# Legacy file-queue directory - only swept into the DB at startup now
+IN_PROGRESS_DIR = os.path.join(BASE_DIR, "in_progress")
+os.makedirs(IN_PROGRESS_DIR, exist_ok=True)
+
+DB_PATH = os.path.join(BASE_DIR, "queue.db")
+
+def load_job(path):
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+        return loads(data)
+    except Exception:
+        return None
+
+def migrate_file_queue(conn):
+    """One-time sweep: move legacy *.json queue files into queue.db."""
+    moved = 0
+    for d in (QUEUE_DIR, IN_PROGRESS_DIR):
+        for name in sorted(os.listdir(d)):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(d, name)
+            job = load_job(path)
+            if job is not None:
+                jobdb.enqueue(conn, job)
+                moved += 1
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    if moved:
+        log(f"... Queue: migrated {moved} legacy file jobs into queue.db")
+
+def wait_for_jobs(inot):
+    """Block until the queue database changes (1s poll as fallback)."""
+    if inot is not None:
+        # Timeout keeps the loop resilient if an event is ever missed
+        inot.read(timeout=5000)
+    else:
+        time.sleep(1)
+
 if __name__ == "__main__":
-    log("🚀 Pipeline Worker Started (Nuclear Fix Edition)...")
-    while True:
-        try:
-            jobs = [f for f in os.listdir(QUEUE_DIR) if f.endswith(".json")]
-            if jobs:
-                jobs.sort()
-                job_file = os.path.join(QUEUE_DIR, jobs[0])
-                
-                with open(job_file, 'r') as f:
-                    job_data = json.load(f)
-                
-                process_video(job_data)
-                
-                if os.path.exists(job_file):
-                    os.remove(job_file)
-            else:
-                time.sleep(1)
-        except Exception as main_e:
-            log(f"Main Loop Error: {main_e}")
-            time.sleep(5)
\ No newline at end of file
+    log(f"🚀 Pipeline Worker Started (Nuclear Fix Edition, {MAX_JOBS} slots)...")
+    prune_ffmpeg_logs()
+    prescale_logos()
+    prewarm_assets()
+
+    conn = jobdb.connect(DB_PATH)
+    migrate_file_queue(conn)
+    # Requeue everything a crashed predecessor claimed but never finished
+    jobdb.requeue_stale(conn, max_age=0)
+
+    inot = None
+    if INOTIFY_AVAILABLE:
+        inot = INotify()
+        # WAL appends hit queue.db-wal; watching both files (plus the
+        # legacy dir) wakes the loop the instant the server inserts
+        for p in (DB_PATH, f"{DB_PATH}-wal", QUEUE_DIR):
+            try:
+                inot.add_watch(p, inotify_flags.MODIFY | inotify_flags.CLOSE_WRITE
+                               | inotify_flags.MOVED_TO)
+            except OSError:
+                pass
+        log("... Queue: inotify dispatch active (zero-latency, no polling)")
+
+    in_flight = {}   # future -> list of claimed job ids
+    with ProcessPoolExecutor(max_workers=MAX_JOBS) as pool:
+        while True:
+            try:
+                # Reap finished groups and delete their rows
+                for fut in [f for f in list(in_flight) if f.done()]:
+                    ids = in_flight.pop(fut)
+                    exc = fut.exception()
+                    if exc:
+                        log(f"Job Error (ids {ids}): {exc}")
+                    jobdb.finish(conn, ids)
+
+                submitted = False
+                while len(in_flight) < MAX_JOBS:
+                    claimed = jobdb.claim(conn)
+                    if claimed is None:
+                        break
+                    lead_id, lead_job = claimed
+                    group_ids, group_jobs = [lead_id], [lead_job]
+
+                    # Pull same-branding logo jobs into the lead's batch so
+                    # one ffmpeg run encodes them all (one NVENC session)
+                    if lead_job.get('logo'):
+                        key = batch_key(lead_job)
+                        matches = [(jid, j) for jid, j in jobdb.pending(conn)
+                                   if batch_key(j) == key][:BATCH_MAX - 1]
+                        got = set(jobdb.claim_ids(conn, [jid for jid, _ in matches]))
+                        for jid, j in matches:
+                            if jid in got:
+                                group_ids.append(jid)
+                                group_jobs.append(j)
+
+                    fut = pool.submit(process_batch, group_jobs)
+                    in_flight[fut] = group_ids
+                    submitted = True
+
+                if not submitted:
+                    wait_for_jobs(inot)
+            except Exception as main_e:
+                log(f"Main Loop Error: {main_e}")
+                time.sleep(5)
\ No newline at end of file